@@ -1,62 +1,15 @@
+import hashlib
 import json
 import os
 from datetime import datetime
+from pathlib import Path
 
-import google.generativeai as genai
+import numpy as np
 
+PLAN_CACHE_DIR = Path.home() / ".garmin-pr-plan" / "plan_cache"
 
-def analyze_fitness(activities):
-    if not activities:
-        return {"has_data": False, "message": "No running activities found"}
-
-    metrics = {
-        "has_data": True,
-        "total_runs": len(activities),
-        "avg_distance_km": sum(a["distance_km"] for a in activities) / len(activities),
-        "total_distance_km": sum(a["distance_km"] for a in activities),
-    }
-
-    paces = [a["avg_pace_min_km"] for a in activities if a["avg_pace_min_km"]]
-    if paces:
-        metrics["avg_pace_min_km"] = sum(paces) / len(paces)
-
-    hrs = [a["avg_hr"] for a in activities if a["avg_hr"]]
-    if hrs:
-        metrics["avg_hr"] = sum(hrs) / len(hrs)
-
-    metrics["recent_runs"] = activities[:10]
-    return metrics
-
-
-def generate_training_plan(fitness_data, distance, goal_pace, race_date, long_run_day="Saturday"):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY must be set in .env file")
-
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-3-pro-preview")
-
-    today = datetime.now().date()
-    race_date_obj = datetime.strptime(race_date, "%Y-%m-%d").date()
-    weeks_until_race = (race_date_obj - today).days // 7
-
-    fitness_summary = json.dumps(fitness_data, indent=2, default=str)
-
-    prompt = f"""You are an elite running coach creating a training plan for an experienced, competitive runner.
-
-ATHLETE DATA:
-{fitness_summary}
-
-RACE GOAL:
-- Distance: {distance}
-- Goal Pace: {goal_pace}
-- Race Date: {race_date}
-- Weeks until race: {weeks_until_race}
-- Today: {today}
-
-SCHEDULE PREFERENCES:
-- Long runs should be on {long_run_day}
-- Space out hard workouts with easy days between them
+_SYSTEM_PROMPT = """You are an elite running coach creating a training plan for an experienced, competitive runner.
+Each request gives you the athlete's recent training data, their race goal and their schedule preferences.
 
 TRAINING PHILOSOPHY:
 Create a periodized plan following Daniels/Pfitzinger/Hudson methodologies. Include:
@@ -81,7 +34,7 @@ CRITICAL FORMATTING RULES:
    - NEVER use "1 min" or "3 min" - use "1:00" or "3:00" instead
 6. Recovery between intervals: use "90 sec" as "1:30" or distance like "400m"
 
-PACE ZONES (based on goal pace {goal_pace}):
+PACE ZONES (relative to the goal pace):
 - Easy: 60-90 sec/mi slower
 - Tempo: 15-20 sec/mi slower
 - VO2max: 20-30 sec/mi faster
@@ -89,44 +42,213 @@ PACE ZONES (based on goal pace {goal_pace}):
 
 OUTPUT FORMAT - Return ONLY valid JSON array:
 [
-  {{
+  {
     "date": "YYYY-MM-DD",
     "name": "Week X - Workout Type",
     "description": "Brief description",
     "steps": [
-      {{"name": "Warm Up", "duration": "2 mi", "target": "8:30/mi", "intensity": "warmup"}},
-      {{"name": "Tempo", "duration": "4 mi", "target": "6:45/mi", "intensity": "active"}},
-      {{"name": "Cool Down", "duration": "1 mi", "target": "8:30/mi", "intensity": "cooldown"}}
+      {"name": "Warm Up", "duration": "2 mi", "target": "8:30/mi", "intensity": "warmup"},
+      {"name": "Tempo", "duration": "4 mi", "target": "6:45/mi", "intensity": "active"},
+      {"name": "Cool Down", "duration": "1 mi", "target": "8:30/mi", "intensity": "cooldown"}
     ]
-  }}
+  }
 ]
 
 For intervals (EACH repeat is a separate step):
-{{"name": "800m Repeat 1", "duration": "800m", "target": "3:00/mi", "intensity": "active"}},
-{{"name": "Recovery 1", "duration": "400m", "target": "jog", "intensity": "rest"}},
-{{"name": "800m Repeat 2", "duration": "800m", "target": "3:00/mi", "intensity": "active"}},
-{{"name": "Recovery 2", "duration": "400m", "target": "jog", "intensity": "rest"}}
-
-Race day (single step only):
-{{
-  "date": "{race_date}",
+{"name": "800m Repeat 1", "duration": "800m", "target": "3:00/mi", "intensity": "active"},
+{"name": "Recovery 1", "duration": "400m", "target": "jog", "intensity": "rest"},
+{"name": "800m Repeat 2", "duration": "800m", "target": "3:00/mi", "intensity": "active"},
+{"name": "Recovery 2", "duration": "400m", "target": "jog", "intensity": "rest"}
+
+Race day (single step only), with the race date, distance and goal pace filled in:
+{
+  "date": "<race date>",
   "name": "Race Day",
-  "description": "Execute your race plan at {goal_pace}",
-  "steps": [{{"name": "{distance}", "duration": "13.1 mi", "target": "{goal_pace}", "intensity": "active"}}]
-}}
+  "description": "Execute your race plan at <goal pace>",
+  "steps": [{"name": "<race distance>", "duration": "<race distance, e.g. 13.1 mi>", "target": "<goal pace>", "intensity": "active"}]
+}
+
+Generate 4-5 quality workouts per week."""
+
+_JSON_DECODER = json.JSONDecoder()
+_MODEL = None
+
+
+def analyze_fitness(activities):
+    n = len(activities["date"]) if activities else 0
+    if not n:
+        return {"has_data": False, "message": "No running activities found"}
+
+    total_distance = float(activities["distance_km"].sum())
+
+    metrics = {
+        "has_data": True,
+        "total_runs": n,
+        "avg_distance_km": total_distance / n,
+        "total_distance_km": total_distance,
+    }
+
+    for column in ("avg_pace_min_km", "avg_hr"):
+        values = activities[column]
+        valid = values > 0
+        count = int(np.count_nonzero(valid))
+        if count:
+            metrics[column] = float(values.sum(where=valid)) / count
+
+    recent = {key: list(column[:10]) for key, column in activities.items()}
+    metrics["recent_runs"] = [
+        {key: None if value != value else value for key, value in zip(recent, row)}
+        for row in zip(*recent.values())
+    ]
+    return metrics
+
+
+def _get_model():
+    global _MODEL
+    if _MODEL is not None:
+        return _MODEL
+
+    import google.generativeai as genai
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY must be set in .env file")
+
+    genai.configure(api_key=api_key)
+    _MODEL = genai.GenerativeModel("gemini-3-pro-preview", system_instruction=_SYSTEM_PROMPT)
+    return _MODEL
+
+
+def _weeks_until_race(today, race_date):
+    race_date_obj = datetime.strptime(race_date, "%Y-%m-%d").date()
+    return (race_date_obj - today).days // 7
+
+
+def _plan_cache_path(fitness_data, distance, goal_pace, race_date, long_run_day):
+    today = datetime.now().date()
+    key = json.dumps({
+        "distance": distance,
+        "goal_pace": goal_pace,
+        "race_date": race_date,
+        "weeks_until_race": _weeks_until_race(today, race_date),
+        "long_run_day": long_run_day,
+        "avg_pace": round(fitness_data.get("avg_pace_min_km", 0), 2),
+        "total_distance": round(fitness_data.get("total_distance_km", 0)),
+        "total_runs": fitness_data.get("total_runs", 0),
+    }, sort_keys=True)
+    return PLAN_CACHE_DIR / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def _load_cached_plan(cache_path):
+    try:
+        plan = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+    today = datetime.now().date().isoformat()
+    return [workout for workout in plan if workout.get("date", today) >= today]
+
+
+def _save_cached_plan(cache_path, plan):
+    tmp_path = cache_path.with_suffix(".tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps(plan))
+        tmp_path.replace(cache_path)
+    except OSError:
+        pass
+
+
+def _build_prompt(fitness_data, distance, goal_pace, race_date, long_run_day):
+    today = datetime.now().date()
+    weeks_until_race = _weeks_until_race(today, race_date)
+
+    fitness_summary = json.dumps(fitness_data, indent=2, default=str)
+
+    return f"""ATHLETE DATA:
+{fitness_summary}
+
+RACE GOAL:
+- Distance: {distance}
+- Goal Pace: {goal_pace}
+- Race Date: {race_date}
+- Weeks until race: {weeks_until_race}
+- Today: {today}
+
+SCHEDULE PREFERENCES:
+- Long runs should be on {long_run_day}
+- Space out hard workouts with easy days between them
 
-Generate 4-5 quality workouts per week.
 Return ONLY the JSON array."""
 
-    response = model.generate_content(prompt)
-    response_text = response.text.strip()
 
-    if "```json" in response_text:
-        response_text = response_text.split("```json")[1].split("```")[0]
-    elif "```" in response_text:
-        response_text = response_text.split("```")[1].split("```")[0]
+def _iter_json_array(chunks):
+    buffer = ""
+    depth = 0
+    start = None
+    in_string = escaped = False
+
+    for chunk in chunks:
+        offset = len(buffer)
+        buffer += chunk
+        for i in range(offset, len(buffer)):
+            c = buffer[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == "\\":
+                    escaped = True
+                elif c == '"':
+                    in_string = False
+            elif depth == 0:
+                if c == "[":
+                    depth = 1
+            elif c == '"':
+                in_string = True
+            elif c in "[{":
+                if depth == 1:
+                    start = i
+                depth += 1
+            elif c in "]}":
+                depth -= 1
+                if depth == 1:
+                    yield _JSON_DECODER.raw_decode(buffer, start)[0]
+                    start = None
+                elif depth == 0:
+                    return
+
+        if start is None:
+            buffer = ""
+        else:
+            buffer = buffer[start:]
+            start = 0
+
+    raise json.JSONDecodeError("Unterminated JSON array", buffer, len(buffer))
+
+
+def generate_training_plan(fitness_data, distance, goal_pace, race_date, long_run_day="Saturday"):
+    return list(stream_training_plan(fitness_data, distance, goal_pace, race_date, long_run_day))
+
+
+def stream_training_plan(fitness_data, distance, goal_pace, race_date, long_run_day="Saturday"):
+    cache_path = _plan_cache_path(fitness_data, distance, goal_pace, race_date, long_run_day)
+    cached = _load_cached_plan(cache_path)
+    if cached:
+        yield from cached
+        return
 
+    model = _get_model()
+    prompt = _build_prompt(fitness_data, distance, goal_pace, race_date, long_run_day)
+
+    response = model.generate_content(prompt, stream=True)
+
+    plan = []
     try:
-        return json.loads(response_text.strip())
+        for workout in _iter_json_array(chunk.text for chunk in response):
+            plan.append(workout)
+            yield workout
     except json.JSONDecodeError:
         raise ValueError("Failed to parse training plan from Gemini")
+
+    if plan:
+        _save_cached_plan(cache_path, plan)
@@ -1,15 +1,153 @@
 import os
+import random
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
-import garth
-from garth import sso
-from garminconnect import Garmin
+import numpy as np
 from rich.console import Console
 from rich.status import Status
 
 TOKEN_DIR = Path.home() / ".garmin-pr-plan"
+UPLOAD_WORKERS = 8
+HTTP_TIMEOUT = (5, 30)
+
+_ZONE_RE = re.compile(r'(\d)')
+
+_STEP_TYPES = {
+    "warmup": (1, "warmup"),
+    "cooldown": (2, "cooldown"),
+    "rest": (4, "recovery"),
+    "active": (3, "interval"),
+}
+_DISTANCE_CONDITION = (3, "distance")
+_TIME_CONDITION = (2, "time")
+_NO_TARGET = ((1, "no.target"), (None, None))
+_PACE_TARGET = (6, "pace.zone")
+_HR_ZONE_TARGET = (4, "heart.rate.zone")
+_MILE_UNITS = frozenset({'mi', 'mile', 'miles'})
+_SECOND_UNITS = frozenset({'sec', 'secs', 'second', 'seconds', 's'})
+_NO_TARGET_WORDS = frozenset({"open", "jog", "easy"})
+_DIST_UNITS = frozenset({'m', 'km'}) | _MILE_UNITS
+_TIME_UNITS = frozenset({'min', 'mins', 'minute', 'minutes'}) | _SECOND_UNITS
+_PACE_SUFFIXES = frozenset({'', 'mi', 'km', '/mi', '/km'})
+_DIGITS = "0123456789"
+
+
+def _is_retryable(error):
+    import requests
+
+    response = getattr(getattr(error, "error", error), "response", None)
+    if response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _call_with_retries(func, *args):
+    for attempt in range(3):
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt == 2 or not _is_retryable(e):
+                raise
+            time.sleep(min(2 ** attempt + random.random(), 8))
+
+
+def _split_quantity(text):
+    unit = text.lstrip(_DIGITS + ".")
+    return text[:len(text) - len(unit)], unit.lstrip()
+
+
+def _split_pace(text):
+    colon = text.find(":")
+    minutes = text[:colon]
+    if colon <= 0 or minutes.strip(_DIGITS):
+        return None
+
+    rest = text[colon + 1:]
+    unit = rest.lstrip(_DIGITS)
+    seconds = rest[:len(rest) - len(unit)]
+    if not seconds or unit not in _PACE_SUFFIXES:
+        return None
+
+    return int(minutes), int(seconds), unit.lstrip("/") or None
+
+
+def _dist_to_meters(value, unit):
+    if unit == 'km':
+        return value * 1000
+    if unit in _MILE_UNITS:
+        return value * 1609.34
+    return value
+
+
+def _pace_to_mps_band(minutes, seconds, is_km):
+    meters_per_second = (1000 if is_km else 1609.34) / (minutes * 60 + seconds)
+    return meters_per_second * 1.05, meters_per_second * 0.95
+
+
+def _parse_duration(duration):
+    return _parse_duration_text(str(duration).strip().lower())
+
+
+@lru_cache(maxsize=256)
+def _parse_duration_text(duration):
+    number, unit = _split_quantity(duration)
+    if number and unit in _DIST_UNITS:
+        return (_DISTANCE_CONDITION, _dist_to_meters(float(number), unit))
+
+    if number and unit in _TIME_UNITS:
+        value = float(number)
+
+        if unit in _SECOND_UNITS:
+            total_seconds = value
+        else:
+            total_seconds = value * 60
+
+        return (_TIME_CONDITION, int(total_seconds))
+
+    if ':' in duration:
+        parts = duration.split(':')
+        if len(parts) == 2:
+            minutes, seconds = int(parts[0]), int(parts[1])
+        else:
+            minutes, seconds = int(parts[0]), 0
+        total_seconds = minutes * 60 + seconds
+        return (_TIME_CONDITION, total_seconds)
+
+    try:
+        total_seconds = int(float(duration)) * 60
+        return (_TIME_CONDITION, total_seconds)
+    except ValueError:
+        return (_TIME_CONDITION, 600)
+
+
+def _parse_target(target):
+    return _parse_target_text(str(target or "").strip().lower())
+
+
+@lru_cache(maxsize=256)
+def _parse_target_text(target):
+    if not target or target in _NO_TARGET_WORDS:
+        return _NO_TARGET
+
+    pace = _split_pace(target)
+    if pace:
+        minutes, seconds, unit = pace
+        is_km = unit == 'km' or (unit is None and minutes < 10)
+        pace_low, pace_high = _pace_to_mps_band(minutes, seconds, is_km)
+        return (_PACE_TARGET, (pace_low, pace_high))
+
+    if "zone" in target:
+        zone_match = _ZONE_RE.search(target)
+        if zone_match:
+            zone_num = int(zone_match.group(1))
+            return (_HR_ZONE_TARGET, (zone_num, zone_num))
+
+    return _NO_TARGET
 
 
 class GarminClient:
@@ -18,6 +156,10 @@ class GarminClient:
         self.client = None
 
     def authenticate(self, console: Console):
+        import garth
+        from garth import sso
+        from garminconnect import Garmin
+
         email = os.getenv("GARMIN_EMAIL")
         password = os.getenv("GARMIN_PASSWORD")
 
@@ -27,6 +169,8 @@ class GarminClient:
         TOKEN_DIR.mkdir(exist_ok=True)
         token_file = TOKEN_DIR / "tokens"
 
+        garth.configure(timeout=HTTP_TIMEOUT)
+
         with Status("[bold]Connecting to Garmin...", spinner="dots", console=console):
             try:
                 garth.resume(str(token_file))
@@ -63,148 +207,77 @@ class GarminClient:
         if not self.client:
             raise RuntimeError("Not authenticated")
 
-        end_date = datetime.now()
+        end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
 
         activities = self.client.get_activities_by_date(
-            start_date.strftime("%Y-%m-%d"),
-            end_date.strftime("%Y-%m-%d"),
+            start_date.isoformat(),
+            end_date.isoformat(),
+            activitytype="running",
         )
 
-        running_activities = []
-        for activity in activities:
-            activity_type = activity.get("activityType", {}).get("typeKey", "")
-            if "running" in activity_type.lower() or "run" in activity_type.lower():
-                running_activities.append({
-                    "date": activity.get("startTimeLocal", ""),
-                    "distance_km": activity.get("distance", 0) / 1000,
-                    "duration_min": activity.get("duration", 0) / 60,
-                    "avg_hr": activity.get("averageHR"),
-                    "avg_pace_min_km": (activity.get("duration", 0) / 60) / (activity.get("distance", 1) / 1000) if activity.get("distance", 0) > 0 else None,
-                    "calories": activity.get("calories"),
-                })
-
-        return running_activities
+        n = len(activities)
+        dates = [""] * n
+        distance_m = np.empty(n, dtype=np.float64)
+        duration_s = np.empty(n, dtype=np.float64)
+        avg_hr = np.empty(n, dtype=np.float64)
+        calories = np.empty(n, dtype=np.float64)
+        for i, activity in enumerate(activities):
+            get = activity.get
+            dates[i] = get("startTimeLocal", "")
+            distance_m[i] = get("distance") or 0
+            duration_s[i] = get("duration") or 0
+            hr = get("averageHR")
+            avg_hr[i] = np.nan if hr is None else hr
+            kcal = get("calories")
+            calories[i] = np.nan if kcal is None else kcal
+
+        distance_km = distance_m / 1000
+        duration_min = duration_s / 60
+        avg_pace_min_km = np.divide(duration_min, distance_km, out=np.full(n, np.nan), where=distance_km > 0)
+
+        return {
+            "date": dates,
+            "distance_km": distance_km,
+            "duration_min": duration_min,
+            "avg_hr": avg_hr,
+            "avg_pace_min_km": avg_pace_min_km,
+            "calories": calories,
+        }
 
     def _build_workout_steps(self, steps):
-        garmin_steps = []
+        garmin_steps = [None] * len(steps)
 
         for i, step in enumerate(steps):
-            step_type = self._get_step_type(step.get("intensity", "active"))
-            duration_type, duration_value = self._parse_duration(step.get("duration", "10:00"))
-            target_type, target_value = self._parse_target(step.get("target", "Open"))
+            step_type_id, step_type_key = _STEP_TYPES.get(step.get("intensity", "active"), _STEP_TYPES["active"])
+            (condition_id, condition_key), duration_value = _parse_duration(step.get("duration", "10:00"))
+            (target_id, target_key), (target_low, target_high) = _parse_target(step.get("target", "Open"))
 
-            garmin_step = {
+            garmin_steps[i] = {
                 "type": "ExecutableStepDTO",
                 "stepId": None,
                 "stepOrder": i + 1,
                 "childStepId": None,
                 "description": None,
                 "stepType": {
-                    "stepTypeId": step_type["id"],
-                    "stepTypeKey": step_type["key"],
+                    "stepTypeId": step_type_id,
+                    "stepTypeKey": step_type_key,
                 },
                 "endCondition": {
-                    "conditionTypeId": duration_type["id"],
-                    "conditionTypeKey": duration_type["key"],
+                    "conditionTypeId": condition_id,
+                    "conditionTypeKey": condition_key,
                 },
                 "endConditionValue": duration_value,
                 "targetType": {
-                    "workoutTargetTypeId": target_type["id"],
-                    "workoutTargetTypeKey": target_type["key"],
+                    "workoutTargetTypeId": target_id,
+                    "workoutTargetTypeKey": target_key,
                 },
-                "targetValueOne": target_value.get("low"),
-                "targetValueTwo": target_value.get("high"),
+                "targetValueOne": target_low,
+                "targetValueTwo": target_high,
             }
-            garmin_steps.append(garmin_step)
 
         return garmin_steps
 
-    def _get_step_type(self, intensity):
-        types = {
-            "warmup": {"id": 1, "key": "warmup"},
-            "cooldown": {"id": 2, "key": "cooldown"},
-            "rest": {"id": 4, "key": "recovery"},
-            "active": {"id": 3, "key": "interval"},
-        }
-        return types.get(intensity, types["active"])
-
-    def _parse_duration(self, duration):
-        duration = str(duration).strip().lower()
-
-        dist_match = re.match(r'^([\d.]+)\s*(m|km|mi|mile|miles)$', duration)
-        if dist_match:
-            value = float(dist_match.group(1))
-            unit = dist_match.group(2)
-
-            if unit == 'm':
-                meters = value
-            elif unit == 'km':
-                meters = value * 1000
-            elif unit in ('mi', 'mile', 'miles'):
-                meters = value * 1609.34
-            else:
-                meters = value
-
-            return ({"id": 3, "key": "distance"}, meters)
-
-        time_match = re.match(r'^([\d.]+)\s*(min|mins|minute|minutes|sec|secs|second|seconds|s)$', duration)
-        if time_match:
-            value = float(time_match.group(1))
-            unit = time_match.group(2)
-
-            if unit in ('sec', 'secs', 'second', 'seconds', 's'):
-                total_seconds = value
-            else:
-                total_seconds = value * 60
-
-            return ({"id": 2, "key": "time"}, int(total_seconds))
-
-        if ':' in duration:
-            parts = duration.split(':')
-            if len(parts) == 2:
-                minutes, seconds = int(parts[0]), int(parts[1])
-            else:
-                minutes, seconds = int(parts[0]), 0
-            total_seconds = minutes * 60 + seconds
-            return ({"id": 2, "key": "time"}, total_seconds)
-
-        try:
-            total_seconds = int(float(duration)) * 60
-            return ({"id": 2, "key": "time"}, total_seconds)
-        except ValueError:
-            return ({"id": 2, "key": "time"}, 600)
-
-    def _parse_target(self, target):
-        if not target or target.lower() in ("open", "jog", "easy"):
-            return ({"id": 1, "key": "no.target"}, {"low": None, "high": None})
-
-        pace_match = re.match(r'^(\d+):(\d+)(?:/?(mi|km))?$', target.strip())
-        if pace_match:
-            minutes = int(pace_match.group(1))
-            seconds = int(pace_match.group(2))
-            unit = pace_match.group(3)
-
-            total_seconds = minutes * 60 + seconds
-
-            if unit == 'km' or (unit is None and minutes < 10):
-                meters_per_second = 1000 / total_seconds
-            else:
-                meters_per_second = 1609.34 / total_seconds
-
-            pace_low = meters_per_second * 1.05
-            pace_high = meters_per_second * 0.95
-
-            return ({"id": 6, "key": "pace.zone"}, {"low": pace_low, "high": pace_high})
-
-        if "zone" in target.lower():
-            zone_match = re.search(r'(\d)', target)
-            if zone_match:
-                zone_num = int(zone_match.group(1))
-                return ({"id": 4, "key": "heart.rate.zone"}, {"low": zone_num, "high": zone_num})
-
-        return ({"id": 1, "key": "no.target"}, {"low": None, "high": None})
-
     def create_workout(self, workout_data):
         if not self.client:
             raise RuntimeError("Not authenticated")
@@ -238,42 +311,64 @@ class GarminClient:
             json={"date": date.isoformat()},
         )
 
+    def _push_workout(self, workout):
+        workout_id = _call_with_retries(self.create_workout, workout)
+        if workout_id and workout.get("date"):
+            _call_with_retries(self.schedule_workout, workout_id, workout["date"])
+
     def push_all_workouts(self, training_plan, console: Console = None):
         if not self.client:
             raise RuntimeError("Not authenticated")
 
-        total = len(training_plan)
+        total = len(training_plan) if hasattr(training_plan, "__len__") else None
         created_count = 0
         failed = []
+        pending = {}
 
-        for i, workout in enumerate(training_plan):
-            name = workout.get('name', 'Unknown')
+        def record(future):
+            nonlocal created_count
+            name = pending.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                failed.append((name, str(e)))
+                mark = "[red]✗[/red]"
+            else:
+                created_count += 1
+                mark = "[green]✓[/green]"
             if console:
-                console.print(f"  [dim]({i+1}/{total})[/dim] {name}...", end=" ")
-
-            success = False
-            for attempt in range(3):
-                try:
-                    workout_id = self.create_workout(workout)
-                    if workout_id and workout.get("date"):
-                        self.schedule_workout(workout_id, workout["date"])
-                    created_count += 1
-                    success = True
-                    if console:
-                        console.print("[green]✓[/green]")
-                    break
-                except Exception as e:
-                    if attempt == 2:
-                        failed.append((name, str(e)))
-                        if console:
-                            console.print("[red]✗[/red]")
+                done = created_count + len(failed)
+                progress = f"{done}/{total}" if total else f"{done}"
+                console.print(f"  [dim]({progress})[/dim] {name}... {mark}")
+
+        generated = 0
+        generation_error = None
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+            try:
+                for workout in training_plan:
+                    generated += 1
+                    future = executor.submit(self._push_workout, workout)
+                    pending[future] = workout.get('name', 'Unknown')
+                    for finished in [f for f in pending if f.done()]:
+                        record(finished)
+            except Exception as e:
+                generation_error = e
+
+            for future in as_completed(list(pending)):
+                record(future)
 
         if failed and console:
             console.print()
-            console.print(f"[yellow]●[/yellow] {len(failed)} workouts failed after retries:")
+            console.print(f"[yellow]●[/yellow] {len(failed)} workouts failed to upload:")
             for name, err in failed[:3]:
                 console.print(f"  [dim]{name}: {err}[/dim]")
             if len(failed) > 3:
                 console.print(f"  [dim]...and {len(failed) - 3} more[/dim]")
 
+        if generation_error is not None:
+            raise RuntimeError(
+                f"{created_count} workouts uploaded, plan generation failed after "
+                f"{generated} workouts: {generation_error}"
+            ) from generation_error
+
         return created_count
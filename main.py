@@ -3,25 +3,30 @@
 import os
 import sys
 
+import numpy as np
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt
 from rich.status import Status
 
-from coach import analyze_fitness, generate_training_plan
+from coach import analyze_fitness, stream_training_plan
 from garmin_client import GarminClient
 
 console = Console()
 
 
 def format_pace(min_per_km):
+    min_per_km = np.asarray(min_per_km, dtype=np.float64)
     min_per_mile = min_per_km * 1.60934
-    mile_min = int(min_per_mile)
-    mile_sec = int((min_per_mile - mile_min) * 60)
-    km_min = int(min_per_km)
-    km_sec = int((min_per_km - km_min) * 60)
-    return f"{mile_min}:{mile_sec:02d}/mi [dim]({km_min}:{km_sec:02d}/km)[/dim]"
+    mile_min = np.floor_divide(min_per_mile, 1).astype(int)
+    mile_sec = (np.mod(min_per_mile, 1) * 60).astype(int)
+    km_min = np.floor_divide(min_per_km, 1).astype(int)
+    km_sec = (np.mod(min_per_km, 1) * 60).astype(int)
+
+    parts = np.stack((mile_min, mile_sec, km_min, km_sec), axis=-1).reshape(-1, 4).tolist()
+    paces = [f"{mm}:{ms:02d}/mi [dim]({km}:{ks:02d}/km)[/dim]" for mm, ms, km, ks in parts]
+    return paces if min_per_km.ndim else paces[0]
 
 
 def main():
@@ -96,21 +101,17 @@ def main():
     console.print()
     console.print()
 
-    with Status("[bold]Generating your personalized training plan...", spinner="dots", console=console):
+    console.print("[bold]Uploading to Garmin Connect...[/bold] [dim](as workouts are generated)[/dim]")
+    console.print()
+
+    training_plan = stream_training_plan(fitness_data, distance, goal_pace, race_date, long_run_day)
+    with Status("[bold]Generating and uploading your training plan...", spinner="dots", console=console):
         try:
-            training_plan = generate_training_plan(fitness_data, distance, goal_pace, race_date, long_run_day)
+            created_count = garmin.push_all_workouts(training_plan, console)
         except Exception as e:
-            console.print(f"\n[red]Error:[/red] Failed to generate plan: {e}")
+            console.print(f"\n[red]Error:[/red] {e}")
             sys.exit(1)
 
-    console.print(f"[green]●[/green] Generated {len(training_plan)} workouts")
-
-    console.print()
-    console.print("[bold]Uploading to Garmin Connect...[/bold]")
-    console.print()
-
-    created_count = garmin.push_all_workouts(training_plan, console)
-
     console.print()
     console.print()
     console.print(Panel.fit(